@@ -0,0 +1,109 @@
+"""
+Which assessments a user may see.
+
+The access table is computed once from a list of super users and a
+{province: [usernames]} mapping (usernames compared case-insensitively)
+and hands out one reusable AccessScope per user:
+
+* ``all``      - super users, every assessment
+* ``province`` - provincial users, assessments of beneficiaries in their province
+* ``own``      - everyone else, only the assessments they took
+
+A scope can filter a SQLAlchemy query (results listing, exports) and check
+a single loaded assessment without touching the database.
+"""
+import threading
+
+from sqlalchemy import func
+
+ALL = 'all'
+PROVINCE = 'province'
+OWN = 'own'
+
+
+class AccessScope:
+    __slots__ = ('table', 'kind', 'username', 'province', 'is_super', 'key')
+
+    def __init__(self, table, kind, username, province=None, is_super=False):
+        self.table = table
+        self.kind = kind
+        self.username = username
+        self.province = province
+        self.is_super = is_super
+        # Users with the same key see exactly the same assessments
+        if kind == ALL:
+            self.key = ALL
+        elif kind == PROVINCE:
+            self.key = f'{PROVINCE}:{province}'
+        else:
+            self.key = f'user:{username}'
+
+    @property
+    def needs_beneficiary(self):
+        """True if criteria() refers to Beneficiary columns."""
+        return self.kind == PROVINCE
+
+    def criteria(self):
+        """WHERE criteria for this scope (Beneficiary must be joined if needs_beneficiary)."""
+        if self.kind == PROVINCE:
+            return [self.table.beneficiary.province == self.province]
+        if self.kind == OWN:
+            # Equality on lower(username) can use ix_assessment_username_lower; ILIKE cannot
+            return [func.lower(self.table.assessment.username) == self.username]
+        return []
+
+    def apply(self, query):
+        """Filters an Assessment query, joining Beneficiary when needed."""
+        if self.needs_beneficiary:
+            query = query.join(self.table.beneficiary)
+        criteria = self.criteria()
+        return query.filter(*criteria) if criteria else query
+
+    def owns(self, assessment):
+        return (assessment.username or '').lower() == self.username
+
+    def can_view(self, assessment):
+        # Super and provincial users may open any assessment; others only their own
+        return self.kind != OWN or self.owns(assessment)
+
+    def can_edit(self, assessment):
+        return self.is_super or self.owns(assessment)
+
+
+class AccessTable:
+    def __init__(self, assessment_model, beneficiary_model, super_users=(), province_users=None):
+        self.assessment = assessment_model
+        self.beneficiary = beneficiary_model
+        self._lock = threading.Lock()
+        self.load(super_users, province_users or {})
+
+    def load(self, super_users, province_users):
+        """Replaces the table; scopes handed out earlier keep their old rules."""
+        provinces = {}
+        for province, usernames in province_users.items():
+            for username in usernames:
+                provinces[username.lower()] = province
+        with self._lock:
+            self._super_users = frozenset(u.lower() for u in super_users)
+            self._provinces = provinces
+            self._scopes = {}
+
+    def is_super(self, username):
+        return username.lower() in self._super_users
+
+    def province_of(self, username):
+        return self._provinces.get(username.lower())
+
+    def scope_for(self, username):
+        username = username.lower()
+        scope = self._scopes.get(username)
+        if scope is None:
+            if username in self._super_users:
+                scope = AccessScope(self, ALL, username, is_super=True)
+            elif username in self._provinces:
+                scope = AccessScope(self, PROVINCE, username, province=self._provinces[username])
+            else:
+                scope = AccessScope(self, OWN, username)
+            with self._lock:
+                scope = self._scopes.setdefault(username, scope)
+        return scope
@@ -0,0 +1,155 @@
+"""
+Engine setup for the app database (app.db, or PostgreSQL via DATABASE_URL).
+
+Server databases get a QueuePool sized by pool_engine_options(); SQLite
+keeps SQLAlchemy's default file pool.
+
+Every SQLite connection gets the same pragmas through a SQLAlchemy ``connect``
+event: WAL journaling (readers no longer block the writer and vice versa),
+synchronous=NORMAL (safe with WAL, far fewer fsyncs), a sized page cache,
+memory-mapped reads and a busy timeout, so a writer waits for the lock
+instead of failing with "database is locked".
+
+Exports and dashboards can use a separate read-only engine over the same
+file (``mode=ro``), so long reads never take part in write locking. On
+other databases they share the main engine and none of this applies.
+"""
+import os
+
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 15000,       # ms a connection waits for a lock
+    'cache_size': -64000,        # negative = KiB, i.e. 64 MB page cache
+    'mmap_size': 268435456,      # 256 MB of the file read through mmap
+    'temp_store': 'MEMORY',
+}
+
+# Pragmas that change the database file; not sent on read-only connections
+_WRITE_PRAGMAS = {'journal_mode'}
+
+
+def database_uri(uri):
+    """
+    ``uri`` with the psycopg2 driver for plain postgresql:// URLs (the
+    driver the app already ships; COPY support relies on it).
+    """
+    url = make_url(uri)
+    if url.drivername in ('postgresql', 'postgres'):
+        url = url.set(drivername='postgresql+psycopg2')
+    return url.render_as_string(hide_password=False)
+
+
+def pool_engine_options(uri, pool_size=10, max_overflow=10, pool_timeout=30, pool_recycle=1800):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for ``uri``: a pre-pinged QueuePool for
+    server databases, nothing for SQLite.
+    """
+    if make_url(uri).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'poolclass': QueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,   # drop connections before server/firewall idle limits
+        'pool_pre_ping': True,
+    }
+
+
+# UNIQUE NULLS NOT DISTINCT on the summary tables
+MIN_POSTGRESQL_VERSION = (15,)
+
+
+def check_server_version(engine):
+    """Raises RuntimeError if ``engine`` is a PostgreSQL server older than MIN_POSTGRESQL_VERSION."""
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.connect():
+        version = engine.dialect.server_version_info
+    if version < MIN_POSTGRESQL_VERSION:
+        raise RuntimeError(
+            f"PostgreSQL {'.'.join(map(str, version))} is not supported; the summary tables need "
+            f"PostgreSQL {'.'.join(map(str, MIN_POSTGRESQL_VERSION))} or newer (UNIQUE NULLS NOT DISTINCT)."
+        )
+
+
+def upsert_insert(engine, table):
+    """
+    INSERT construct of the engine's dialect, which offers
+    ``on_conflict_do_update()`` on SQLite (3.24+) and PostgreSQL.
+    """
+    if engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    if engine.dialect.name == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f'No upsert support for {engine.dialect.name}')
+
+
+def is_sqlite(engine):
+    return engine.dialect.name == 'sqlite'
+
+
+def sqlite_path(engine):
+    """Database file of a SQLite engine, or None for in-memory databases."""
+    database = engine.url.database
+    if not database or database == ':memory:' or database.startswith('file::memory:'):
+        return None
+    return database
+
+
+def _pragma_listener(pragmas, readonly=False):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                if readonly and name in _WRITE_PRAGMAS:
+                    continue
+                cursor.execute(f'PRAGMA {name} = {value}')
+            if readonly:
+                cursor.execute('PRAGMA query_only = ON')
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def configure_sqlite_engine(engine, pragmas=None):
+    """Applies ``pragmas`` to every new connection of a SQLite engine."""
+    if not is_sqlite(engine):
+        return False
+    event.listen(engine, 'connect', _pragma_listener(pragmas or DEFAULT_SQLITE_PRAGMAS))
+    return True
+
+
+def create_readonly_engine(engine, pragmas=None):
+    """
+    Read-only engine over the same SQLite file as ``engine``. Returns
+    ``engine`` itself for other databases and in-memory SQLite.
+    """
+    path = sqlite_path(engine) if is_sqlite(engine) else None
+    if path is None:
+        return engine
+    readonly = create_engine(
+        f'sqlite:///file:{os.path.abspath(path)}?mode=ro&uri=true',
+        connect_args={'check_same_thread': False}
+    )
+    event.listen(readonly, 'connect', _pragma_listener(pragmas or DEFAULT_SQLITE_PRAGMAS, readonly=True))
+    return readonly
+
+
+def wal_checkpoint(engine, mode='TRUNCATE'):
+    """
+    Copies the write-ahead log back into the database file. Returns
+    (busy, log_frames, checkpointed_frames) as reported by SQLite, or None
+    for non-SQLite engines.
+    """
+    if not is_sqlite(engine):
+        return None
+    with engine.connect() as conn:
+        row = conn.exec_driver_sql(f'PRAGMA wal_checkpoint({mode})').fetchone()
+        conn.commit()
+    return tuple(row)
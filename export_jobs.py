@@ -0,0 +1,251 @@
+"""
+Background report exports with a shared on-disk artifact cache.
+
+Export files are built on a small thread pool instead of inside the
+request. Jobs are content-addressed: the caller derives ``job_id`` from
+everything that determines the file (e.g. access scope, data version and
+format), and the finished file is stored in the export directory under
+that id. Any worker process that sees the file can serve it, and asking
+for the same id again returns the existing file (or the running build)
+instead of generating a second copy.
+
+Builds in progress are visible to other processes as ``<job_id>.*.part``
+files (created when the job is queued) and failed builds as
+``<job_id>.failed`` markers holding the error.
+"""
+import glob
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ExportJob:
+    def __init__(self, job_id, path, state=QUEUED):
+        self.id = job_id
+        self.path = path
+        self.format = os.path.splitext(job_id)[1].lstrip('.')
+        self.state = state
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.finished_at = time.time() if state == DONE else None
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    def set_progress(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def to_dict(self):
+        percent = None
+        if self.state == DONE:
+            percent = 100
+        elif self.total:
+            percent = min(99, int(self.done * 100 / self.total))
+        return {
+            "id": self.id,
+            "format": self.format,
+            "state": self.state,
+            "done": self.done,
+            "total": self.total,
+            "percent": percent,
+            "error": self.error,
+        }
+
+
+class ExportJobManager:
+    """
+    Runs ``build(path, progress)`` callables on a thread pool, storing the
+    result as ``<directory>/<job_id>``.
+
+    ``runner`` wraps each build (e.g. to push a Flask app context).
+    Artifacts unused for ``ttl`` seconds are removed by cleanup().
+    """
+
+    def __init__(self, directory, max_workers=2, ttl=24 * 60 * 60, runner=None, part_ttl=6 * 60 * 60):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.ttl = ttl
+        # .part files untouched this long belong to a crashed worker
+        self.part_ttl = part_ttl
+        self.runner = runner or (lambda fn: fn())
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._part_ids = itertools.count()
+
+    def _get_executor(self):
+        # Created lazily so importing the app does not start threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='export')
+        return self._executor
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, os.path.basename(job_id))
+
+    def _building_elsewhere(self, path):
+        return bool(glob.glob(glob.escape(path) + '.*.part'))
+
+    def _failed_error(self, path):
+        """Error recorded by a failed build of ``path`` (None if there is none)."""
+        try:
+            with open(path + '.failed', encoding='utf-8') as f:
+                return f.read() or 'unknown error'
+        except OSError:
+            return None
+
+    def submit(self, job_id, build, family=None):
+        """
+        Returns the job for ``job_id``, starting ``build`` only if the file
+        is neither on disk nor being built. When the build succeeds, other
+        artifacts whose id starts with ``family`` (older versions of the
+        same report) are removed.
+        """
+        self.cleanup()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.active:
+                return job
+            path = self._path(job_id)
+            if os.path.exists(path):
+                # Reused artifacts count as fresh for cleanup()
+                os.utime(path)
+                job = ExportJob(job_id, path, state=DONE)
+                self._jobs[job_id] = job
+                return job
+            job = ExportJob(job_id, path)
+            self._jobs[job_id] = job
+            # Retrying: forget an earlier failure, then announce the build
+            _remove_file(path + '.failed')
+            os.makedirs(self.directory, exist_ok=True)
+            partial = f'{path}.{os.getpid()}.{next(self._part_ids)}.part'
+            open(partial, 'wb').close()
+            executor = self._get_executor()
+        executor.submit(self._run, job, build, family, partial)
+        return job
+
+    def get(self, job_id):
+        """The job for ``job_id``, also when it was built by another process."""
+        job = self._jobs.get(job_id)
+        if job is not None and (job.active or job.state == DONE and os.path.exists(job.path)):
+            return job
+        # Finished or failed here: another worker may have rebuilt it since
+        path = self._path(job_id)
+        if os.path.exists(path):
+            return ExportJob(job_id, path, state=DONE)
+        if self._building_elsewhere(path):
+            return ExportJob(job_id, path, state=RUNNING)
+        error = self._failed_error(path)
+        if error is not None:
+            job = ExportJob(job_id, path, state=FAILED)
+            job.error = error
+            return job
+        return None
+
+    def _run(self, job, build, family, partial):
+        job.state = RUNNING
+        try:
+            self.runner(lambda: build(partial, job.set_progress))
+            os.replace(partial, job.path)
+            job.state = DONE
+            if family:
+                self._remove_superseded(job, family)
+        except Exception as e:
+            logger.exception('Export %s failed', job.id)
+            job.error = str(e)
+            job.state = FAILED
+            _remove_file(partial)
+            try:
+                with open(job.path + '.failed', 'w', encoding='utf-8') as f:
+                    f.write(job.error)
+            except OSError:
+                pass
+        finally:
+            job.finished_at = time.time()
+
+    def _remove_superseded(self, job, family):
+        pattern = os.path.join(self.directory, glob.escape(family) + '*.' + job.format)
+        for path in glob.glob(pattern):
+            if path != job.path:
+                self._remove(os.path.basename(path))
+
+    def _remove(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        _remove_file(self._path(job_id))
+
+    def cleanup(self):
+        """
+        Removes artifacts and failure markers unused for ``ttl`` seconds,
+        and .part files left behind by crashed workers (older than ``part_ttl``).
+        """
+        now = time.time()
+        cutoff = now - self.ttl
+        with self._lock:
+            expired = [job.id for job in self._jobs.values()
+                       if job.state == FAILED and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            mtime = entry.stat().st_mtime
+            if entry.name.endswith('.part'):
+                if mtime < now - self.part_ttl:
+                    _remove_file(entry.path)
+            elif entry.name.endswith('.failed'):
+                if mtime < cutoff:
+                    _remove_file(entry.path)
+            elif mtime < cutoff:
+                self._remove(entry.name)
+
+    def clear(self):
+        """Removes every finished artifact (e.g. after the database is recreated)."""
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith('.part'):
+                continue
+            if entry.name.endswith('.failed'):
+                _remove_file(entry.path)
+            else:
+                self._remove(entry.name)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        artifacts = []
+        if os.path.isdir(self.directory):
+            artifacts = [entry for entry in os.scandir(self.directory)
+                         if entry.is_file() and not entry.name.endswith(('.part', '.failed'))]
+        return {
+            "workers": self.max_workers,
+            "queued": sum(1 for job in jobs if job.state == QUEUED),
+            "running": sum(1 for job in jobs if job.state == RUNNING),
+            "failed": sum(1 for job in jobs if job.state == FAILED),
+            "artifacts": len(artifacts),
+            "artifact_bytes": sum(entry.stat().st_size for entry in artifacts),
+        }
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,90 @@
+"""
+Region XII address gazetteer (province -> municipality -> barangay).
+
+address.csv is parsed once and the sorted province names, together with the
+pre-serialized JSON (and ETag) of every province, municipality and barangay
+list, are shared by every request. The file is re-read only when its
+modification time changes.
+"""
+import csv
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from types import MappingProxyType
+
+
+class AddressSnapshot:
+    """Immutable, fully sorted view of one version of address.csv."""
+
+    __slots__ = ('mtime', 'provinces', 'lists')
+
+    def __init__(self, mtime, data):
+        self.mtime = mtime
+        self.provinces = tuple(data.keys())
+        # (body, etag) per list: () provinces, (province,) municipalities,
+        # (province, municipality) barangays
+        lists = {(): _json_entry(self.provinces)}
+        for province, municipalities in data.items():
+            lists[(province,)] = _json_entry(municipalities.keys())
+            for municipality, barangays in municipalities.items():
+                lists[(province, municipality)] = _json_entry(barangays)
+        self.lists = MappingProxyType(lists)
+
+
+def _json_entry(values):
+    body = json.dumps(list(values))
+    return body, hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+class AddressGazetteer:
+    """Loads address.csv once and reloads it when the file's mtime changes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _parse(self):
+        address_data = defaultdict(lambda: defaultdict(set))
+        with open(self.path, mode='r', encoding='utf-8') as csv_file:
+            csv_reader = csv.DictReader(csv_file)
+            for row in csv_reader:
+                province = row['Province Name']
+                municipality = row['City/Municipality Name']
+                barangay = row['Barangay Name']
+
+                if province and municipality and barangay:
+                    address_data[province][municipality].add(barangay)
+
+        # Sort provinces, municipalities and barangays
+        return {
+            province: {
+                municipality: sorted(address_data[province][municipality])
+                for municipality in sorted(address_data[province])
+            }
+            for province in sorted(address_data)
+        }
+
+    def snapshot(self):
+        """Return the current snapshot, re-parsing the CSV only if it changed."""
+        mtime = os.stat(self.path).st_mtime_ns
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.mtime == mtime:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.mtime != mtime:
+                snapshot = AddressSnapshot(mtime, self._parse())
+                self._snapshot = snapshot
+        return snapshot
+
+    def list_json(self, *path):
+        """
+        Pre-serialized (body, etag) of the list below ``path`` (provinces,
+        municipalities of a province or barangays of a municipality), or
+        None if the path is unknown.
+        """
+        return self.snapshot().lists.get(path)
@@ -0,0 +1,121 @@
+"""
+Bulk copy of the app tables from a SQLite file into PostgreSQL.
+
+Each table is read from SQLite in batches (yield_per) and fed to
+PostgreSQL's ``COPY ... FROM STDIN`` through a file-like object, so a
+table of any size is sent as one COPY stream without being loaded into
+memory. All tables are copied in one transaction on the target; serial
+sequences are moved past the copied ids afterwards so new rows do not
+collide with migrated ones.
+"""
+from sqlalchemy import Integer, inspect, select
+
+BATCH_SIZE = 5000
+
+
+def copy_value(value):
+    """One field in COPY text format (\\N for NULL, escaped separators)."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+class CopyStream:
+    """Read-only file object over COPY text lines, as expected by copy_expert()."""
+
+    def __init__(self, rows):
+        self._lines = ('\t'.join(copy_value(v) for v in row) + '\n' for row in rows)
+        self._buffer = ''
+        self.rows = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+            self.rows += 1
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    readline = read
+
+
+def source_columns(source_engine, table):
+    """Columns of ``table`` present in the source database (None if the table is missing)."""
+    inspector = inspect(source_engine)
+    if not inspector.has_table(table.name):
+        return None
+    existing = {col['name'] for col in inspector.get_columns(table.name)}
+    return [col for col in table.columns if col.name in existing]
+
+
+def serial_columns(table):
+    """Integer primary keys, which SQLAlchemy creates as SERIAL on PostgreSQL."""
+    columns = list(table.primary_key.columns)
+    if len(columns) == 1 and isinstance(columns[0].type, Integer) and columns[0].autoincrement:
+        return columns
+    return []
+
+
+def non_empty_tables(target_engine, tables):
+    with target_engine.connect() as conn:
+        return [table.name for table in tables
+                if conn.execute(select(1).select_from(table).limit(1)).first() is not None]
+
+
+def copy_tables(source_engine, target_engine, tables, truncate=False, batch_size=BATCH_SIZE, progress=None):
+    """
+    Copies ``tables`` (in foreign key order) from ``source_engine`` into the
+    existing, empty tables of ``target_engine``. With ``truncate`` the target
+    tables are emptied first. Returns {table name: rows copied}; tables
+    missing from the source are reported as None.
+    """
+    progress = progress or (lambda name, rows: None)
+    copied = {}
+    target = target_engine.raw_connection()
+    try:
+        cursor = target.cursor()
+        if truncate:
+            names = ', '.join(f'"{table.name}"' for table in tables)
+            cursor.execute(f'TRUNCATE {names} RESTART IDENTITY CASCADE')
+
+        with source_engine.connect() as source:
+            for table in tables:
+                columns = source_columns(source_engine, table)
+                if columns is None:
+                    copied[table.name] = None
+                    progress(table.name, None)
+                    continue
+
+                result = source.execute(
+                    select(*columns).execution_options(yield_per=batch_size))
+                stream = CopyStream(result)
+                column_list = ', '.join(f'"{col.name}"' for col in columns)
+                cursor.copy_expert(
+                    f'COPY "{table.name}" ({column_list}) FROM STDIN', stream)
+                result.close()
+
+                for col in serial_columns(table):
+                    cursor.execute(
+                        f'SELECT setval(pg_get_serial_sequence(%s, %s), '
+                        f'coalesce(max("{col.name}"), 0) + 1, false) FROM "{table.name}"',
+                        (f'"{table.name}"', col.name))
+                copied[table.name] = stream.rows
+                progress(table.name, stream.rows)
+
+        target.commit()
+    except Exception:
+        target.rollback()
+        raise
+    finally:
+        target.close()
+    return copied
@@ -0,0 +1,137 @@
+"""
+Pooled PostgreSQL connections for the db_dms database (users and roster).
+
+Wraps psycopg2's ThreadedConnectionPool with:
+  * a blocking checkout (callers wait for a free slot instead of failing)
+  * a cheap health check on checkout, pinging connections that sat idle
+  * a context-manager API that always returns the connection to the pool
+  * wait-time and utilisation counters for monitoring
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+
+class PostgresPool:
+    def __init__(self, minconn, maxconn, acquire_timeout=30, ping_after=30, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.ping_after = ping_after  # seconds idle before a connection is pinged
+        self.connect_kwargs = connect_kwargs
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+
+        # Metrics
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _get_pool(self):
+        # Created lazily so importing the app does not require PostgreSQL
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.connect_kwargs)
+        return self._pool
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.ping_after:
+            # Freshly opened or recently used
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        pool = self._get_pool()
+        # One retry: a stale connection is replaced by a freshly opened one
+        for _ in range(2):
+            conn = pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            with self._lock:
+                self._discarded += 1
+        return pool.getconn()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a ``with`` block.
+        Uncommitted work is rolled back when the connection is returned.
+        """
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolError(f"Timed out after {self.acquire_timeout}s waiting for a PostgreSQL connection")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+        try:
+            yield conn
+        finally:
+            self._last_used[id(conn)] = time.monotonic()
+            # putconn() rolls back open transactions and closes broken connections
+            self._get_pool().putconn(conn, close=conn.closed != 0)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "utilisation": round(self._in_use / self.maxconn, 3),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded_connections": self._discarded,
+                "avg_wait_ms": round(self._total_wait / self._checkouts * 1000, 3) if self._checkouts else 0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._last_used.clear()
@@ -0,0 +1,302 @@
+"""
+Household roster lookups (ds.tbl_roster grantees) for the enumerator form.
+
+Only the columns the form fills in are selected. Results are kept in a
+bounded TTL cache, and household IDs that are not in the roster are cached
+too (for a shorter time) so repeated misses do not reach PostgreSQL.
+
+For offices with poor links to db_dms, the grantee rows can be copied into a
+local SQLite file (``flask sync-roster``). Lookups then answer from the local
+copy first and fall back to PostgreSQL for households not synced yet.
+Cached rows are dropped as soon as a worker notices a newer sync
+(``last_synced_at``), even when the sync ran in another process.
+"""
+import datetime
+import os
+import sqlite3
+
+from ttl_cache import MISSING
+
+# Columns used by the household search in templates/index.html
+ROSTER_COLUMNS = (
+    'hh_id',
+    'first_name',
+    'middle_name',
+    'last_name',
+    'sex',
+    'relation_to_hh_head',
+    'contact_number',
+    'province',
+    'municipality',
+    'barangay',
+    'parent_group_name',
+)
+
+_SELECT_GRANTEES = (
+    f"SELECT {', '.join(ROSTER_COLUMNS)} FROM ds.tbl_roster "
+    "WHERE hh_id = ANY(%s) AND grantee = 'YES'"
+)
+
+
+def _check_roster_column(pg_conn, column):
+    """Raises ValueError unless ``column`` exists in ds.tbl_roster."""
+    with pg_conn.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = 'ds' AND table_name = 'tbl_roster' AND column_name = %s",
+            (column,)
+        )
+        if cur.fetchone() is None:
+            raise ValueError(f"ds.tbl_roster has no column '{column}' to use as the sync watermark")
+
+
+def _sqlite_value(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+class LocalRosterStore:
+    """Indexed SQLite copy of the ds.tbl_roster grantee rows."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _create_tables(self, conn, table='roster'):
+        columns = ', '.join(f'{column} TEXT' for column in ROSTER_COLUMNS)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns})')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_hh_id ON {table} (hh_id)')
+        conn.execute('CREATE TABLE IF NOT EXISTS roster_sync (key TEXT PRIMARY KEY, value TEXT)')
+
+    def is_available(self):
+        return os.path.exists(self.path)
+
+    def mtime(self):
+        """Modification time of the SQLite file (None if it does not exist)."""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def lookup(self, hh_ids):
+        """Returns {hh_id: [rows]} for the household IDs present locally."""
+        found = {}
+        if not hh_ids or not self.is_available():
+            return found
+
+        placeholders = ', '.join('?' for _ in hh_ids)
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(ROSTER_COLUMNS)} FROM roster WHERE hh_id IN ({placeholders})",
+                list(hh_ids)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # Not synced yet
+            return found
+        finally:
+            conn.close()
+
+        for row in rows:
+            found.setdefault(row['hh_id'], []).append(dict(row))
+        return found
+
+    def get_meta(self, key):
+        if not self.is_available():
+            return None
+        conn = self._connect()
+        try:
+            return self._get_meta(conn, key)
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
+
+    def _get_meta(self, conn, key):
+        row = conn.execute('SELECT value FROM roster_sync WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute('INSERT OR REPLACE INTO roster_sync (key, value) VALUES (?, ?)', (key, value))
+
+    def sync(self, pg_conn, watermark_column=None, chunk_size=5000, full=False):
+        """
+        Copies grantee rows from PostgreSQL.
+
+        A full sync streams every grantee row through a server-side named
+        cursor into a fresh table that replaces the old one at the end.
+        An incremental sync (opt-in: ``watermark_column`` names an existing
+        timestamp column of ds.tbl_roster and a previous watermark exists)
+        only re-copies households with rows modified after the last
+        watermark. Returns (mode, rows_copied).
+        """
+        conn = self._connect()
+        try:
+            self._create_tables(conn)
+            if not watermark_column:
+                # Without a watermark every sync is a full one; drop any stale watermark
+                full = True
+                conn.execute("DELETE FROM roster_sync WHERE key = 'watermark'")
+            else:
+                _check_roster_column(pg_conn, watermark_column)
+            last_watermark = None if full else self._get_meta(conn, 'watermark')
+
+            new_watermark = None
+            if watermark_column:
+                # Read before copying, so rows changed during the copy are picked up next time
+                with pg_conn.cursor() as cur:
+                    cur.execute(f"SELECT max({watermark_column}) AS watermark FROM ds.tbl_roster")
+                    new_watermark = cur.fetchone()['watermark']
+
+            if last_watermark is None:
+                mode, copied = 'full', self._sync_full(conn, pg_conn, chunk_size)
+            else:
+                mode, copied = 'incremental', self._sync_changed(
+                    conn, pg_conn, watermark_column, last_watermark, chunk_size)
+
+            if new_watermark is not None:
+                self._set_meta(conn, 'watermark', str(new_watermark))
+            self._set_meta(conn, 'last_synced_at', datetime.datetime.now().isoformat(timespec='seconds'))
+            conn.commit()
+            return mode, copied
+        finally:
+            conn.close()
+
+    def _insert(self, conn, table, rows):
+        placeholders = ', '.join('?' for _ in ROSTER_COLUMNS)
+        conn.executemany(
+            f'INSERT INTO {table} ({", ".join(ROSTER_COLUMNS)}) VALUES ({placeholders})',
+            [tuple(_sqlite_value(row[column]) for column in ROSTER_COLUMNS) for row in rows]
+        )
+
+    def _sync_full(self, conn, pg_conn, chunk_size):
+        conn.execute('DROP TABLE IF EXISTS roster_new')
+        self._create_tables(conn, table='roster_new')
+
+        copied = 0
+        with pg_conn.cursor(name='roster_full_sync') as cur:
+            cur.itersize = chunk_size
+            cur.execute(
+                f"SELECT {', '.join(ROSTER_COLUMNS)} FROM ds.tbl_roster WHERE grantee = 'YES'"
+            )
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                self._insert(conn, 'roster_new', rows)
+                copied += len(rows)
+
+        # Swap in the new copy; readers never see a partially loaded table
+        conn.execute('DROP TABLE IF EXISTS roster')
+        conn.execute('ALTER TABLE roster_new RENAME TO roster')
+        conn.execute('DROP INDEX IF EXISTS ix_roster_new_hh_id')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_roster_hh_id ON roster (hh_id)')
+        return copied
+
+    def _sync_changed(self, conn, pg_conn, watermark_column, last_watermark, chunk_size):
+        copied = 0
+        with pg_conn.cursor(name='roster_incremental_sync') as changed:
+            changed.itersize = chunk_size
+            changed.execute(
+                f"SELECT DISTINCT hh_id FROM ds.tbl_roster WHERE {watermark_column} > %s",
+                (last_watermark,)
+            )
+            while True:
+                hh_ids = [row['hh_id'] for row in changed.fetchmany(chunk_size)]
+                if not hh_ids:
+                    break
+
+                with pg_conn.cursor() as cur:
+                    cur.execute(_SELECT_GRANTEES, (hh_ids,))
+                    rows = cur.fetchall()
+
+                # Replace every row of the changed households, including ones
+                # that stopped being grantees
+                placeholders = ', '.join('?' for _ in hh_ids)
+                conn.execute(f'DELETE FROM roster WHERE hh_id IN ({placeholders})', hh_ids)
+                self._insert(conn, 'roster', rows)
+                copied += len(rows)
+        return copied
+
+
+class RosterLookup:
+    def __init__(self, connection_factory, cache, negative_ttl=60, local_store=None):
+        self.connection_factory = connection_factory
+        self.cache = cache
+        self.negative_ttl = negative_ttl
+        self.local_store = local_store
+        self._store_mtime = None
+        self._synced_at = None
+
+    def _check_resync(self):
+        """Clears the cache when the local copy was re-synced (e.g. by another process)."""
+        mtime = self.local_store.mtime()
+        if mtime == self._store_mtime:
+            return
+        self._store_mtime = mtime
+        synced_at = self.local_store.get_meta('last_synced_at')
+        if synced_at != self._synced_at:
+            self._synced_at = synced_at
+            self.cache.clear()
+
+    def _fetch(self, hh_ids):
+        found = {hh_id: [] for hh_id in hh_ids}
+
+        # Local copy first, PostgreSQL only for households not synced yet
+        remote = list(hh_ids)
+        if self.local_store is not None:
+            found.update(self.local_store.lookup(hh_ids))
+            remote = [hh_id for hh_id in hh_ids if not found[hh_id]]
+
+        if remote:
+            with self.connection_factory() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(_SELECT_GRANTEES, (remote,))
+                    for row in cur.fetchall():
+                        found.setdefault(row['hh_id'], []).append(dict(row))
+        return found
+
+    def _remember(self, hh_id, rows):
+        # Empty results are negative-cached for a shorter period
+        self.cache.set(hh_id, rows, ttl=None if rows else self.negative_ttl)
+
+    def get(self, hh_id):
+        """Grantee rows for one household ID (empty list if not found)."""
+        return self.get_many([hh_id])[hh_id]
+
+    def get_many(self, hh_ids):
+        """
+        Resolves many household IDs, querying PostgreSQL once for every
+        ID that is not cached. Returns {hh_id: [rows]}.
+        """
+        if self.local_store is not None:
+            self._check_resync()
+
+        results = {}
+        pending = []
+        for hh_id in dict.fromkeys(hh_ids):
+            rows = self.cache.get(hh_id)
+            if rows is MISSING:
+                pending.append(hh_id)
+            else:
+                results[hh_id] = rows
+
+        if pending:
+            fetched = self._fetch(pending)
+            for hh_id in pending:
+                rows = fetched[hh_id]
+                self._remember(hh_id, rows)
+                results[hh_id] = rows
+
+        return results
+
+    def invalidate(self, hh_id=None):
+        if hh_id is None:
+            self.cache.clear()
+        else:
+            self.cache.delete(hh_id)
@@ -0,0 +1,96 @@
+"""
+Full-text search over beneficiary name and household ID.
+
+An SQLite FTS5 table with the trigram tokenizer mirrors the ``beneficiary``
+table (rowid = beneficiary.id), so substring searches such as part of a
+household ID or a surname are answered from the index instead of scanning
+the table with LIKE '%...%'. Queries shorter than three characters, or
+databases without FTS5 support, fall back to the caller's ILIKE filter.
+"""
+from sqlalchemy import column, text
+from sqlalchemy.exc import OperationalError
+
+FTS_TABLE = 'beneficiary_fts'
+MIN_QUERY_LENGTH = 3  # trigram tokenizer needs at least one full trigram
+
+_ready = False
+
+
+def _is_sqlite(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def is_ready(connection):
+    """True once the FTS table exists (the positive answer is remembered)."""
+    global _ready
+    if _ready:
+        return True
+    if not _is_sqlite(connection):
+        return False
+    _ready = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first() is not None
+    return _ready
+
+
+def create(connection):
+    """Creates the FTS table. Returns False if the database cannot host it."""
+    if not _is_sqlite(connection):
+        return False
+    try:
+        # A savepoint keeps the caller's transaction usable if this fails
+        with connection.begin_nested():
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(name, household_id, tokenize = 'trigram')"
+            ))
+    except OperationalError:
+        # SQLite built without FTS5, or older than 3.34 (no trigram tokenizer)
+        return False
+    return True
+
+
+def rebuild(connection):
+    """(Re)creates the FTS table and fills it from ``beneficiary``."""
+    global _ready
+    if not create(connection):
+        return None
+    connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    result = connection.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, household_id) "
+        "SELECT id, coalesce(name, ''), household_id FROM beneficiary"
+    ))
+    _ready = True
+    return result.rowcount
+
+
+def index_beneficiary(connection, beneficiary_id, name, household_id):
+    if not is_ready(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': beneficiary_id})
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, name, household_id) VALUES (:id, :name, :household_id)"),
+        {'id': beneficiary_id, 'name': name or '', 'household_id': household_id or ''}
+    )
+
+
+def remove_beneficiary(connection, beneficiary_id):
+    if not is_ready(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': beneficiary_id})
+
+
+def can_search(connection, query_text):
+    return len(query_text.strip()) >= MIN_QUERY_LENGTH and is_ready(connection)
+
+
+def matching_ids(query_text):
+    """
+    Subquery of beneficiary ids whose name or household ID contains
+    ``query_text`` (case-insensitive), for use with ``column.in_()``.
+    """
+    phrase = '"' + query_text.strip().replace('"', '""') + '"'
+    return text(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_phrase"
+    ).bindparams(fts_phrase=phrase).columns(column('rowid'))
@@ -0,0 +1,81 @@
+import os
+import re
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'app.db')
+
+from app import Beneficiary, SimpleUser, app, db, login_manager  # noqa: E402
+
+# Stored the way CURRENT_TIMESTAMP writes it; ids 3-5 share a second
+DATES = {
+    1: '2024-01-01 08:00:00',
+    2: '2024-01-01 09:00:00',
+    3: '2024-01-01 10:00:00',
+    4: '2024-01-01 10:00:00',
+    5: '2024-01-01 10:00:00',
+    6: '2024-01-01 11:00:00',
+    7: '2024-01-01 12:00:00',
+}
+
+
+@pytest.fixture()
+def client():
+    app.config['TESTING'] = True
+    login_manager._user_callback = lambda user_id: SimpleUser({'user_id': user_id, 'username': user_id})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        beneficiary = Beneficiary(name='A', household_id='H1', province='SARANGANI')
+        db.session.add(beneficiary)
+        db.session.flush()
+        for assessment_id, date_taken in DATES.items():
+            db.session.execute(
+                db.text('INSERT INTO assessment (id, beneficiary_id, username, date_taken) '
+                        'VALUES (:id, :beneficiary_id, :username, :date_taken)'),
+                {'id': assessment_id, 'beneficiary_id': beneficiary.id,
+                 'username': 'aaquinones', 'date_taken': date_taken}
+            )
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = 'aaquinones'
+        session['_fresh'] = True
+    return client
+
+
+def page(client, url):
+    html = client.get(url).get_data(as_text=True)
+    ids = [int(i) for i in re.findall(r'/view_assessment/(\d+)', html)]
+    links = dict(re.findall(r'href="([^"#]+)">(?:&lsaquo; )?(Newer|Older)', html))
+    return list(dict.fromkeys(ids)), {label: href.replace('&amp;', '&') for href, label in links.items()}
+
+
+def test_older_pages_cover_every_row_once(client):
+    seen = []
+    url = '/results?per_page=2'
+    pages = []
+    while url and len(pages) <= len(DATES):  # bounded: a broken cursor repeats pages forever
+        ids, links = page(client, url)
+        pages.append(ids)
+        seen.extend(ids)
+        url = links.get('Older')
+    assert pages == [[7, 6], [5, 4], [3, 2], [1]]
+    assert seen == sorted(DATES, reverse=True)
+
+
+def test_newer_walks_back_across_ties(client):
+    ids, links = page(client, '/results?per_page=2')
+    ids, links = page(client, links['Older'])
+    ids, links = page(client, links['Older'])
+    assert ids == [3, 2]
+    ids, links = page(client, links['Newer'])
+    assert ids == [5, 4]
+    ids, links = page(client, links['Newer'])
+    assert ids == [7, 6]
+    assert 'Newer' not in links